@@ -4,6 +4,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import numpy as np
+import duckdb
 
 st.set_page_config(page_title="Streamlit BI x Claude Code Starter", layout="wide")
 
@@ -17,7 +18,10 @@ def load_data():
         # データ前処理
         orders_df['created_at'] = pd.to_datetime(orders_df['created_at'], errors='coerce')
         orders_df = orders_df.dropna(subset=['created_at'])
-        orders_df['year_month'] = orders_df['created_at'].dt.to_period('M').astype(str)
+        # ステータスは種類が少ないので category 型（比較は整数コード同士になる）
+        orders_df['status'] = orders_df['status'].astype('category')
+        # 月キーは文字列化せず Period 型のまま保持
+        orders_df['year_month'] = orders_df['created_at'].dt.to_period('M')
         
         return orders_df, users_df
     except FileNotFoundError:
@@ -33,18 +37,28 @@ def prepare_monthly_analysis(orders_df):
         return pd.DataFrame(), pd.DataFrame()
     
     try:
-        # 月別総注文数
-        monthly_orders = orders_df.groupby('year_month').size().reset_index(name='total_orders')
-        
-        # 月別キャンセル数
-        monthly_cancelled = orders_df[orders_df['status'] == 'Cancelled'].groupby('year_month').size().reset_index(name='cancelled_orders')
-        
-        # データ結合
-        monthly_data = monthly_orders.merge(monthly_cancelled, on='year_month', how='left')
-        monthly_data['cancelled_orders'] = monthly_data['cancelled_orders'].fillna(0)
-        
-        # キャンセル率計算
-        monthly_data['cancel_rate'] = (monthly_data['cancelled_orders'] / monthly_data['total_orders'] * 100).round(2)
+        # 月別総注文数・キャンセル数・キャンセル率を DuckDB の1クエリで集計
+        # （列指向・マルチスレッドで集計。必要な2列だけを登録する）
+        # グループキーは月初のタイムスタンプ（固定長の整数値）とし、
+        # 'YYYY-MM' 文字列への変換は集計後の月数分だけ行う
+        with duckdb.connect() as con:
+            con.register('orders', orders_df[['created_at', 'status']])
+            monthly_data = con.execute("""
+                SELECT
+                    strftime(month_start, '%Y-%m') AS year_month,
+                    total_orders,
+                    cancelled_orders,
+                    ROUND(cancelled_orders * 100.0 / total_orders, 2) AS cancel_rate
+                FROM (
+                    SELECT
+                        date_trunc('month', created_at) AS month_start,
+                        COUNT(*) AS total_orders,
+                        COUNT(*) FILTER (WHERE status = 'Cancelled') AS cancelled_orders
+                    FROM orders
+                    GROUP BY 1
+                )
+                ORDER BY month_start
+            """).df()
         
         return monthly_data, orders_df
     except Exception as e:
@@ -119,13 +133,15 @@ if not orders_df.empty:
         
         # 詳細データテーブル
         st.subheader("月別詳細データ")
+        # 列名・表示形式は column_config で指定（DataFrame のコピーを作らず、書式はフロントエンド側で適用）
         st.dataframe(
-            monthly_data.rename(columns={
+            monthly_data,
+            column_config={
                 'year_month': '年月',
-                'total_orders': '総注文数',
-                'cancelled_orders': 'キャンセル数',
-                'cancel_rate': 'キャンセル率(%)'
-            }),
+                'total_orders': st.column_config.NumberColumn('総注文数', format='%d'),
+                'cancelled_orders': st.column_config.NumberColumn('キャンセル数', format='%d'),
+                'cancel_rate': st.column_config.NumberColumn('キャンセル率(%)', format='%.2f%%')
+            },
             use_container_width=True
         )
     else:
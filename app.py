@@ -6,7 +6,19 @@ import plotly.express as px
 # ─────────────────────────────
 # データ読み込み
 # ─────────────────────────────
-df = pd.read_csv("data/sample_sales.csv", parse_dates=["date"])
+# 数量・単価は int32、種類の少ない文字列列は category 型で読み込む
+df = pd.read_csv(
+    "data/sample_sales.csv",
+    parse_dates=["date"],
+    dtype={
+        "category": "category",
+        "units": "int32",
+        "unit_price": "int32",
+        "region": "category",
+        "sales_channel": "category",
+        "customer_segment": "category",
+    },
+)
 
 # ─────────────────────────────
 # UI ― フィルター類
@@ -88,7 +100,7 @@ st.plotly_chart(fig_daily, use_container_width=True)
 
 # 2) カテゴリ別売上
 revenue_by_cat = (
-    df_filt.groupby("category", as_index=False)["revenue"].sum().sort_values("revenue")
+    df_filt.groupby("category", as_index=False, observed=True)["revenue"].sum().sort_values("revenue")
 )
 fig_cat = px.bar(
     revenue_by_cat,
@@ -103,7 +115,7 @@ st.plotly_chart(fig_cat, use_container_width=True)
 
 # 3) 地域別売上
 revenue_by_region = (
-    df_filt.groupby("region", as_index=False)["revenue"].sum().sort_values("revenue")
+    df_filt.groupby("region", as_index=False, observed=True)["revenue"].sum().sort_values("revenue")
 )
 fig_region = px.bar(
     revenue_by_region,
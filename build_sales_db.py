@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Build data/sales.duckdb from data/sample_sales.csv
+
+chatbot_app.init_duckdb opens this file read-only instead of rebuilding
+the sales table in memory, as long as it is newer than the CSV.
+
+Run Command:
+uv run python build_sales_db.py
+"""
+
+import os
+import sys
+
+import duckdb
+
+# Add current directory to path to import chatbot functions
+sys.path.append('.')
+
+from chatbot_app import SALES_DB_PATH, create_sales_table, load_sales_data
+
+def build_sales_db(db_path: str = SALES_DB_PATH) -> None:
+    """Write the sales table to a DuckDB database file"""
+    # Build into a temporary file and swap it in, so readers never see a partial database
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    
+    with duckdb.connect(tmp_path) as con:
+        create_sales_table(con, load_sales_data())
+        rows = con.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    
+    os.replace(tmp_path, db_path)
+    print(f"✅ {db_path}: {rows} rows in sales table")
+
+if __name__ == "__main__":
+    build_sales_db()
@@ -19,10 +19,14 @@ import pandas as pd
 import duckdb
 import plotly.express as px
 import plotly.graph_objects as go
+import pyarrow as pa
 import re
 import os
-from typing import Optional, Tuple
-import io
+from enum import Enum
+from functools import lru_cache, partial
+from typing import Callable, Optional, Tuple
+
+from sales_data import CSV_PATH, read_sales_frame
 
 # LLM Client Setup
 try:
@@ -32,15 +36,27 @@ except ImportError:
     st.error("Please install openai: uv add openai>=1.30.0")
     st.stop()
 
+# Prebuilt DuckDB database with the sales table (see build_sales_db.py)
+SALES_DB_PATH = "data/sales.duckdb"
+
 # Required columns for validation
 REQUIRED_COLUMNS = ['date', 'category', 'units', 'unit_price', 'region', 'sales_channel', 'customer_segment', 'revenue']
 
 # Blocked SQL keywords for safety
-BLOCKED_KEYWORDS = ['insert', 'update', 'delete', 'drop', 'alter', 'create', 'replace', 'attach', 'copy', 'pragma', 'script', 'call', ';']
+BLOCKED_KEYWORDS = ['insert', 'update', 'delete', 'drop', 'alter', 'create', 'replace', 'attach', 'copy', 'pragma', 'script', 'call', 'truncate', 'grant', 'revoke']
+
+# Precompiled patterns: one scan for any blocked keyword or a semicolon, and code block markers
+BLOCKED_SQL_RE = re.compile(r'\b(?:' + '|'.join(BLOCKED_KEYWORDS) + r')\b|;', re.IGNORECASE)
+SELECT_PREFIX_RE = re.compile(r'\s*select\b', re.IGNORECASE)
+CODE_FENCE_RE = re.compile(r'```(?:sql)?\s*')
+
+@st.cache_data
+def load_sales_data(data_version: Optional[float] = None) -> pd.DataFrame:
+    """Load and validate existing CSV data with required transformations
 
-def load_sales_data() -> pd.DataFrame:
-    """Load and validate existing CSV data with required transformations"""
-    csv_path = "data/sample_sales.csv"
+    data_version (CSV mtime) is only used as the cache key.
+    """
+    csv_path = CSV_PATH
     
     # Check if file exists
     if not os.path.exists(csv_path):
@@ -49,8 +65,8 @@ def load_sales_data() -> pd.DataFrame:
         st.stop()
     
     try:
-        # Load CSV
-        df = pd.read_csv(csv_path)
+        # Load CSV with pyarrow (via Parquet sidecar; date column is already datetime)
+        df = read_sales_frame(csv_path, arrow_dtypes=True)
         
         # Validate required columns
         missing_cols = set(REQUIRED_COLUMNS) - set(df.columns)
@@ -59,9 +75,6 @@ def load_sales_data() -> pd.DataFrame:
             st.error(f"Required columns: {REQUIRED_COLUMNS}")
             st.stop()
         
-        # Convert date column to datetime
-        df['date'] = pd.to_datetime(df['date'])
-        
         # Fill missing revenue with units * unit_price (in-memory only)
         if df['revenue'].isnull().any():
             df['revenue'] = df['revenue'].fillna(df['units'] * df['unit_price'])
@@ -72,16 +85,16 @@ def load_sales_data() -> pd.DataFrame:
         st.error(f"❌ Error loading CSV file: {str(e)}")
         st.stop()
 
-def init_duckdb(df: pd.DataFrame) -> duckdb.DuckDBPyConnection:
-    """Initialize DuckDB with sales view"""
-    con = duckdb.connect(':memory:')
-    
-    # Register DataFrame
-    con.register('sales_df', df)
+def create_sales_table(con: duckdb.DuckDBPyConnection, df: pd.DataFrame) -> None:
+    """Materialize the sales table (with month column) from the sales DataFrame"""
+    # Register as an Arrow table: the DataFrame is pyarrow-backed, so this hands
+    # DuckDB the existing Arrow buffers without a pandas -> DuckDB conversion copy
+    con.register('sales_raw', pa.Table.from_pandas(df, preserve_index=False))
     
-    # Create sales view with month column
+    # Materialize sales table with month column (date_trunc runs once, not per query),
+    # stored sorted by month, category so GROUP BY month scans runs of equal keys
     con.execute("""
-        CREATE OR REPLACE VIEW sales AS
+        CREATE OR REPLACE TABLE sales AS
         SELECT
             date,
             date_trunc('month', date)::date AS month,
@@ -92,13 +105,31 @@ def init_duckdb(df: pd.DataFrame) -> duckdb.DuckDBPyConnection:
             sales_channel,
             customer_segment,
             revenue
-        FROM sales_df
+        FROM sales_raw
+        ORDER BY month, category
     """)
+    con.unregister('sales_raw')
+
+@st.cache_resource
+def init_duckdb(_df: pd.DataFrame, data_version: Optional[float] = None) -> duckdb.DuckDBPyConnection:
+    """Initialize DuckDB with sales table (once per data_version, shared across reruns)
+
+    The leading underscore keeps Streamlit from hashing the DataFrame;
+    data_version (CSV mtime) is the cache key instead.
+    The connection is shared by all sessions (threads): run queries on
+    con.cursor(), never on the connection itself.
+    """
+    # Use the prebuilt database (build_sales_db.py) when it is up to date with the CSV
+    if os.path.exists(SALES_DB_PATH) and os.path.getmtime(SALES_DB_PATH) >= os.path.getmtime(CSV_PATH):
+        return duckdb.connect(SALES_DB_PATH, read_only=True)
     
+    con = duckdb.connect(':memory:')
+    create_sales_table(con, _df)
     return con
 
+@lru_cache(maxsize=1)
 def build_system_prompt(max_rows: int = 5000) -> str:
-    """Build system prompt for LLM with strict constraints"""
+    """Build system prompt for LLM with strict constraints (built once per process)"""
     return f"""あなたは既存の sales テーブルのみを対象とする DuckDB用SQLアシスタント。
 
 重要な制約:
@@ -136,66 +167,66 @@ ORDER BY total_revenue DESC
 
 コードブロックなしで純粋なSQLのみを出力してください。"""
 
-def generate_sql(user_msg: str) -> str:
-    """Generate SQL using LLM API"""
+@st.cache_resource
+def get_openai_client() -> openai.OpenAI:
+    """Create the OpenAI client once and reuse its HTTP connection pool across calls"""
+    return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def request_sql(user_msg: str) -> str:
+    """Ask the LLM for SQL (cached per message; API errors raise and are not cached)"""
     system_prompt = build_system_prompt()
     
+    if LLM_PROVIDER == "openai":
+        client = get_openai_client()
+        response = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_msg}
+            ],
+            temperature=0.1,
+            max_tokens=500
+        )
+        sql = response.choices[0].message.content.strip()
+    
+    # Uncomment below for Anthropic API
+    # elif LLM_PROVIDER == "anthropic":
+    #     client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    #     response = client.messages.create(
+    #         model="claude-3-haiku-20240307",
+    #         max_tokens=500,
+    #         temperature=0.1,
+    #         messages=[
+    #             {"role": "user", "content": f"{system_prompt}\n\n{user_msg}"}
+    #         ]
+    #     )
+    #     sql = response.content[0].text.strip()
+    
+    else:
+        raise ValueError("No supported LLM provider available")
+    
+    # Remove code block markers if present
+    sql = CODE_FENCE_RE.sub('', sql).strip()
+    
+    return sql
+
+def generate_sql(user_msg: str) -> str:
+    """Generate SQL using LLM API"""
     try:
-        if LLM_PROVIDER == "openai":
-            client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_msg}
-                ],
-                temperature=0.1,
-                max_tokens=500
-            )
-            sql = response.choices[0].message.content.strip()
-        
-        # Uncomment below for Anthropic API
-        # elif LLM_PROVIDER == "anthropic":
-        #     client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        #     response = client.messages.create(
-        #         model="claude-3-haiku-20240307",
-        #         max_tokens=500,
-        #         temperature=0.1,
-        #         messages=[
-        #             {"role": "user", "content": f"{system_prompt}\n\n{user_msg}"}
-        #         ]
-        #     )
-        #     sql = response.content[0].text.strip()
-        
-        else:
-            raise ValueError("No supported LLM provider available")
-        
-        # Remove code block markers if present
-        sql = re.sub(r'```sql\s*', '', sql)
-        sql = re.sub(r'```\s*', '', sql)
-        sql = sql.strip()
-        
-        return sql
-        
+        return request_sql(user_msg)
     except Exception as e:
         st.error(f"LLM API Error: {str(e)}")
         return fallback_sql(user_msg)
 
 def is_safe_sql(sql: str) -> bool:
     """Check if SQL is safe to execute"""
-    sql_lower = sql.lower().strip()
-    
-    # Check for blocked keywords
-    for keyword in BLOCKED_KEYWORDS:
-        if keyword in sql_lower:
-            return False
-    
-    # Must start with SELECT
-    if not sql_lower.startswith('select'):
+    # Check for blocked keywords and semicolons (single statement only) in one pass
+    if BLOCKED_SQL_RE.search(sql):
         return False
     
-    # Must be single statement (no semicolons)
-    if ';' in sql:
+    # Must start with SELECT (matched in place, no lowercased copy of the query)
+    if not SELECT_PREFIX_RE.match(sql):
         return False
     
     return True
@@ -225,66 +256,136 @@ ORDER BY total_revenue DESC"""
     else:
         return """SELECT SUM(revenue) AS total_revenue FROM sales"""
 
-def run_sql(con: duckdb.DuckDBPyConnection, sql: str) -> pd.DataFrame:
-    """Execute SQL and return DataFrame"""
+@st.cache_data(max_entries=256, show_spinner=False)
+def query_sales(_con: duckdb.DuckDBPyConnection, sql: str, data_version: Optional[float] = None) -> pd.DataFrame:
+    """Execute a normalized SELECT (cached per SQL string and data_version)
+
+    The sales table only changes with the CSV, so the result does not depend on
+    which connection or cursor runs the query; _con is not part of the key.
+    _con is shared by every session, so each call runs on its own cursor
+    (a DuckDB connection must not execute from several threads at once).
+    """
+    cur = _con.cursor()
+    try:
+        table = cur.execute(sql).arrow()
+    finally:
+        cur.close()
+    
+    # DECIMAL results (e.g. SUM over integer columns) become float64, as with .df()
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    
+    # Keep DuckDB's Arrow buffers as pyarrow-backed columns (no NumPy/object copy)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+def run_sql(con: duckdb.DuckDBPyConnection, sql: str, data_version: Optional[float] = None) -> pd.DataFrame:
+    """Execute SQL and return DataFrame (repeat queries are served from the cache)"""
     # Add LIMIT if not present
     if 'limit' not in sql.lower():
         sql = sql.rstrip(';') + ' LIMIT 5000'
     
     try:
-        result = con.execute(sql).df()
-        return result
+        return query_sales(con, sql, data_version)
     except Exception as e:
         raise Exception(f"SQL実行エラー: {str(e)}")
 
-def auto_chart(df: pd.DataFrame) -> None:
-    """Generate automatic chart based on DataFrame structure (Plotly Express, labels-based)"""
-    if df.empty:
-        return
+class ChartKind(Enum):
+    """Chart pattern chosen for a query result"""
+    NONE = 'none'
+    LINE_BY_CATEGORY = 'line_by_category'  # month, category, total_revenue -> 折れ線（色=category）
+    BAR = 'bar'                            # 次元×値 -> 棒
+    LINE = 'line'                          # month×値 -> 折れ線
 
-    cols = df.columns.tolist()
-    colset = set(cols)
+# 候補列（値列は優先順位つき。判定は集合演算で行う）
+CATEGORY_LINE_COLS = frozenset(['month', 'category', 'total_revenue'])
+DIM_SET = frozenset(['category', 'sales_channel', 'region', 'customer_segment'])
+VAL_PRIORITY = {'total_revenue': 0, 'total_units': 1, 'revenue': 2, 'units': 3, 'count': 4}
+VAL_SET = frozenset(VAL_PRIORITY)
 
-    # 候補列
-    dim_candidates = ['category', 'sales_channel', 'region', 'customer_segment']
-    val_candidates = ['total_revenue', 'total_units', 'revenue', 'units', 'count']
+def classify_chart(cols: Tuple[str, ...]) -> ChartKind:
+    """Classify a result's columns into a chart pattern (pure, no DataFrame needed)"""
+    colset = frozenset(cols)
 
     # 1) month, category, total_revenue -> 折れ線（色=category）
-    if {'month', 'category', 'total_revenue'}.issubset(colset):
-        fig = px.line(
-            df.sort_values('month'),
-            x='month', y='total_revenue', color='category',
-            title='月別・カテゴリ別 売上推移',
-            labels={'month': '月', 'total_revenue': '売上', 'category': 'カテゴリ'}
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        return
+    if CATEGORY_LINE_COLS <= colset:
+        return ChartKind.LINE_BY_CATEGORY
 
     # 2) 次元×値 -> 棒
-    if len(cols) == 2:
-        dim_col, value_col = cols[0], cols[1]
-        if dim_col in dim_candidates and value_col in val_candidates:
-            fig = px.bar(
-                df,
-                x=dim_col, y=value_col,
-                title=f'{dim_col} 別 {value_col}',
-                labels={dim_col: dim_col, value_col: value_col}
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            return
+    if len(cols) == 2 and cols[0] in DIM_SET and cols[1] in VAL_SET:
+        return ChartKind.BAR
 
     # 3) month×値 -> 折れ線
-    if 'month' in colset:
-        value_col = next((v for v in val_candidates if v in colset and v != 'month'), None)
-        if value_col:
-            fig = px.line(
-                df.sort_values('month'),
-                x='month', y=value_col,
-                title=f'月別 {value_col} 推移',
-                labels={'month': '月', value_col: value_col}
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            return
+    if 'month' in colset and VAL_SET & colset:
+        return ChartKind.LINE
+
+    return ChartKind.NONE
+
+def pick_value_col(colset: frozenset) -> Optional[str]:
+    """Return the highest-priority value column present in colset"""
+    cand = VAL_SET & colset
+    return min(cand, key=VAL_PRIORITY.__getitem__) if cand else None
+
+def _line_by_category(df: pd.DataFrame) -> go.Figure:
+    """month, category, total_revenue -> 折れ線（色=category）"""
+    return px.line(
+        df.sort_values('month'),
+        x='month', y='total_revenue', color='category',
+        title='月別・カテゴリ別 売上推移',
+        labels={'month': '月', 'total_revenue': '売上', 'category': 'カテゴリ'}
+    )
+
+def _bar_by_dim(df: pd.DataFrame, dim_col: str, value_col: str) -> go.Figure:
+    """次元×値 -> 棒"""
+    return px.bar(
+        df,
+        x=dim_col, y=value_col,
+        title=f'{dim_col} 別 {value_col}',
+        labels={dim_col: dim_col, value_col: value_col}
+    )
+
+def _line_by_month(df: pd.DataFrame, value_col: str) -> go.Figure:
+    """month×値 -> 折れ線"""
+    return px.line(
+        df.sort_values('month'),
+        x='month', y=value_col,
+        title=f'月別 {value_col} 推移',
+        labels={'month': '月', value_col: value_col}
+    )
+
+@lru_cache(maxsize=128)
+def match_chart(cols: Tuple[str, ...]) -> Optional[Callable[[pd.DataFrame], go.Figure]]:
+    """Pick the chart renderer for a result's columns (memoized per column tuple)"""
+    kind = classify_chart(cols)
+    if kind is ChartKind.LINE_BY_CATEGORY:
+        return _line_by_category
+    if kind is ChartKind.BAR:
+        return partial(_bar_by_dim, dim_col=cols[0], value_col=cols[1])
+    if kind is ChartKind.LINE:
+        return partial(_line_by_month, value_col=pick_value_col(frozenset(cols)))
+    return None
+
+def auto_chart(df: pd.DataFrame) -> None:
+    """Generate automatic chart based on DataFrame structure (Plotly Express, labels-based)"""
+    if df.empty:
+        return
+
+    # 同じ列構成の結果は判定済みの描画関数を再利用する
+    render = match_chart(tuple(df.columns))
+    if render:
+        st.plotly_chart(render(df), use_container_width=True)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def result_to_csv(_df: pd.DataFrame, sql: str, data_version: Optional[float] = None) -> bytes:
+    """Serialize a query result to CSV bytes (cached per SQL and data_version)"""
+    # pandas writes pyarrow-backed timestamps with an explicit 00:00:00 time;
+    # datetime64 columns are written as plain dates when all times are midnight
+    timestamp_cols = {
+        col: 'datetime64[ns]'
+        for col, dtype in _df.dtypes.items()
+        if isinstance(dtype, pd.ArrowDtype) and pa.types.is_timestamp(dtype.pyarrow_dtype)
+    }
+    return _df.astype(timestamp_cols).to_csv(index=False).encode('utf-8')
 
 def summarize_result(df: pd.DataFrame) -> str:
     """Generate brief Japanese summary of results"""
@@ -331,8 +432,9 @@ def main():
     
     # Load data and initialize DB
     with st.spinner("データを読み込んでいます..."):
-        sales_df = load_sales_data()
-        con = init_duckdb(sales_df)
+        data_version = os.path.getmtime(CSV_PATH) if os.path.exists(CSV_PATH) else None
+        sales_df = load_sales_data(data_version)
+        con = init_duckdb(sales_df, data_version)
     
     # Sidebar - Data Overview
     with st.sidebar:
@@ -344,7 +446,7 @@ def main():
         st.write(f"**チャネル数**: {sales_df['sales_channel'].nunique()}チャネル")
         
         st.subheader("💾 元データ確認")
-        csv_exists = os.path.exists("data/sample_sales.csv")
+        csv_exists = os.path.exists(CSV_PATH)
         st.write(f"CSV存在: {'✅' if csv_exists else '❌'}")
         
         # Sample data preview
@@ -366,14 +468,13 @@ def main():
                 if "summary" in message:
                     st.info(message["summary"])
                 
-                # Download button
-                csv_buffer = io.StringIO()
-                message["dataframe"].to_csv(csv_buffer, index=False)
+                # Download button (no rerun on click)
                 st.download_button(
                     label="📥 結果をCSVでダウンロード",
-                    data=csv_buffer.getvalue(),
+                    data=result_to_csv(message["dataframe"], message["sql"], data_version),
                     file_name="query_result.csv",
-                    mime="text/csv"
+                    mime="text/csv",
+                    on_click="ignore"
                 )
     
     # Chat input
@@ -403,7 +504,7 @@ def main():
                 
                 try:
                     # Execute SQL
-                    result_df = run_sql(con, generated_sql)
+                    result_df = run_sql(con, generated_sql, data_version)
                     
                     if result_df.empty:
                         st.warning("結果が見つかりませんでした。")
@@ -427,14 +528,13 @@ def main():
                         # Summary
                         st.info(f"📊 {summary}")
                         
-                        # Download button
-                        csv_buffer = io.StringIO()
-                        result_df.to_csv(csv_buffer, index=False)
+                        # Download button (no rerun on click)
                         st.download_button(
                             label="📥 結果をCSVでダウンロード",
-                            data=csv_buffer.getvalue(),
+                            data=result_to_csv(result_df, generated_sql, data_version),
                             file_name="query_result.csv",
-                            mime="text/csv"
+                            mime="text/csv",
+                            on_click="ignore"
                         )
                         
                         response_msg = {
@@ -451,7 +551,7 @@ def main():
                     
                     try:
                         fallback_query = fallback_sql(prompt)
-                        result_df = run_sql(con, fallback_query)
+                        result_df = run_sql(con, fallback_query, data_version)
                         
                         if not result_df.empty:
                             summary = summarize_result(result_df)
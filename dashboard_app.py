@@ -11,9 +11,11 @@
 # インポート
 # ──────────────────
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-from pathlib import Path
+
+from sales_data import read_sales_frame
 
 # ──────────────────
 # データ読み込み関数
@@ -22,36 +24,94 @@ from pathlib import Path
 def load_data() -> pd.DataFrame:
     """
     CSV を読み込んで前処理を行う。
-    - date 列を datetime 型に変換
-    - 日付で昇順ソート
+    - Parquet サイドカー経由で読み込み（型・datetime 変換済み、文字列列は category 型）
+    - 日付で昇順ソート（既に昇順なら並べ替えない）
     """
-    df = pd.read_csv(
-        Path("data/sample_sales.csv"),
-        parse_dates=["date"],
-        dtype={
-            "category": "string",
-            "units": "int",
-            "unit_price": "int",
-            "region": "string",
-            "sales_channel": "string",
-            "customer_segment": "string",
-            "revenue": "int",
-        },
-    ).sort_values("date")
+    df = read_sales_frame()
+    if not df["date"].is_monotonic_increasing:
+        df = df.sort_values("date", kind="mergesort")
 
     # 欠損値チェック（必要に応じて補完）
     if df.isna().any().any():
-        st.warning("欠損値が含まれています。空セルを 0 で補完しました。")
-        df = df.fillna(0)
-
-    # revenue 一貫性チェック
-    inconsistent = df[df["revenue"] != df["units"] * df["unit_price"]]
-    if not inconsistent.empty:
-        st.info(f"売上金額が一致しない行が {len(inconsistent)} 件あります。CSV の値を優先します。")
+        st.warning("欠損値が含まれています。数値列の空セルは 0、カテゴリ列の空セルは「不明」で補完しました。")
+        num_cols = df.select_dtypes("number").columns
+        df[num_cols] = df[num_cols].fillna(0)
+        # カテゴリ列は「不明」カテゴリを追加して補完（棒グラフから行が落ちて KPI と合わなくなるのを防ぐ）
+        for col in df.select_dtypes("category").columns:
+            if df[col].isna().any():
+                df[col] = df[col].cat.add_categories("不明").fillna("不明")
+
+    # revenue 一貫性チェック（件数だけ必要なので NumPy で数え、不一致行の DataFrame は作らない）
+    # units / unit_price は int32 なので、積のオーバーフローを避けて int64 で計算
+    units = df["units"].to_numpy(dtype=np.int64)
+    unit_price = df["unit_price"].to_numpy(dtype=np.int64)
+    num_inconsistent = int(np.count_nonzero(df["revenue"].to_numpy() != units * unit_price))
+    if num_inconsistent:
+        st.info(f"売上金額が一致しない行が {num_inconsistent} 件あります。CSV の値を優先します。")
 
     return df
 
 
+def sum_by_date(df: pd.DataFrame, value_col: str) -> pd.DataFrame:
+    """
+    日付順にソート済みの DataFrame を日付ごとに合計する。
+    - datetime64[D] への変換で時刻部分を切り捨て、日単位のキーにする（Python の date オブジェクトは作らない）
+    - 日付が切り替わる位置を境界として np.add.reduceat で区間和を取る（groupby のハッシュ集計を行わない）
+    """
+    dates = df["date"].to_numpy().astype("datetime64[D]")
+    is_start = np.empty(len(dates), dtype=bool)
+    is_start[:1] = True
+    is_start[1:] = dates[1:] != dates[:-1]
+    bounds = np.flatnonzero(is_start)
+    return pd.DataFrame({
+        "date": dates[bounds],
+        value_col: np.add.reduceat(df[value_col].to_numpy(), bounds),
+    })
+
+
+# ──────────────────
+# グラフ作成関数
+# ──────────────────
+# 同じ期間を選び直したときは Plotly Express の図生成を省略するため、
+# 図は dict にしてキャッシュする。キーは期間のみ
+# （先頭が _ の引数は Streamlit がハッシュしないので DataFrame 全体は走査しない）
+@st.cache_data(max_entries=256)
+def make_category_bar(_df_filtered: pd.DataFrame, start_date: pd.Timestamp, end_date: pd.Timestamp) -> dict:
+    """カテゴリ別売上棒グラフを作成する。"""
+    category_revenue = (
+        _df_filtered.groupby("category", as_index=False, observed=True)["revenue"]
+        .sum()
+        .sort_values("revenue", ascending=False)
+    )
+
+    fig_bar = px.bar(
+        category_revenue,
+        x="category",
+        y="revenue",
+        labels={"category": "商品カテゴリ", "revenue": "売上 (円)"},
+        title="商品カテゴリごとの総売上",
+    )
+    fig_bar.update_layout(font_family="sans-serif", yaxis_tickformat=",")
+    return fig_bar.to_dict()
+
+
+@st.cache_data(max_entries=256)
+def make_daily_line(_df_filtered: pd.DataFrame, start_date: pd.Timestamp, end_date: pd.Timestamp) -> dict:
+    """日別売上推移折れ線グラフ（赤色）を作成する。"""
+    daily_revenue = sum_by_date(_df_filtered, "revenue")
+
+    fig_line = px.line(
+        daily_revenue,
+        x="date",
+        y="revenue",
+        labels={"date": "日付", "revenue": "売上 (円)"},
+        title="日毎の売上推移",
+    )
+    fig_line.update_traces(line_color="red")
+    fig_line.update_layout(font_family="sans-serif", yaxis_tickformat=",")
+    return fig_line.to_dict()
+
+
 # ──────────────────
 # メインアプリ
 # ──────────────────
@@ -76,9 +136,12 @@ def main() -> None:
     )
 
     # 日付範囲を DataFrame に適用
+    # （load_data で日付順にソート済みなので、二分探索で境界を求めて連続スライスを取る）
     start_date, end_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-    mask = (df["date"] >= start_date) & (df["date"] <= end_date)
-    df_filtered = df.loc[mask]
+    dates = df["date"].to_numpy()
+    lo = dates.searchsorted(start_date.to_datetime64(), side="left")
+    hi = dates.searchsorted(end_date.to_datetime64(), side="right")
+    df_filtered = df.iloc[lo:hi]
 
     # ──────────────────
     # KPI カード
@@ -98,37 +161,14 @@ def main() -> None:
     # カテゴリ別売上棒グラフ
     # ──────────────────
     st.subheader("カテゴリ別売上")
-    category_revenue = (
-        df_filtered.groupby("category", as_index=False)["revenue"].sum().sort_values("revenue", ascending=False)
-    )
-
-    fig_bar = px.bar(
-        category_revenue,
-        x="category",
-        y="revenue",
-        labels={"category": "商品カテゴリ", "revenue": "売上 (円)"},
-        title="商品カテゴリごとの総売上",
-    )
-    fig_bar.update_layout(font_family="sans-serif", yaxis_tickformat=",")
+    fig_bar = make_category_bar(df_filtered, start_date, end_date)
     st.plotly_chart(fig_bar, use_container_width=True)
 
     # ──────────────────
     # 日別売上推移折れ線グラフ
     # ──────────────────
     st.subheader("日別売上推移")
-    daily_revenue = (
-        df_filtered.groupby("date", as_index=False)["revenue"].sum().sort_values("date")
-    )
-
-    fig_line = px.line(
-        daily_revenue,
-        x="date",
-        y="revenue",
-        labels={"date": "日付", "revenue": "売上 (円)"},
-        title="日毎の売上推移",
-    )
-    fig_line.update_traces(line_color="red")
-    fig_line.update_layout(font_family="sans-serif", yaxis_tickformat=",")
+    fig_line = make_daily_line(df_filtered, start_date, end_date)
     st.plotly_chart(fig_line, use_container_width=True)
 
 
@@ -6,11 +6,11 @@ import plotly.express as px
 st.title('Plotly基礎')
 st.write('Plotlyを使ってインタラクティブなグラフを作成してみましょう！')
 
-df = pd.read_csv('data/sample_sales.csv', parse_dates=['date']) 
+df = pd.read_csv('data/sample_sales.csv', parse_dates=['date'], dtype={'category': 'category'})
 
 st.subheader('カテゴリ別合計売上グラフ')
 
-category_revenue = df.groupby('category')['revenue'].sum().reset_index()
+category_revenue = df.groupby('category', observed=True)['revenue'].sum().reset_index()
 
 fig = px.bar(
     category_revenue,
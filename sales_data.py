@@ -0,0 +1,90 @@
+"""
+売上データ読み込みユーティリティ
+---------------------------
+- data/sample_sales.csv を pyarrow の CSV リーダーで読み込む共通処理
+  （列の型は SALES_COLUMN_TYPES で明示し、型推論を行わない）
+- 初回読み込み時に Parquet サイドカー (data/sample_sales.parquet) を書き出し、
+  以降は CSV より新しければ Parquet から読み込む
+"""
+
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+CSV_PATH = "data/sample_sales.csv"
+
+# 文字列列は種類が少ないので辞書エンコード（pandas では category 型になる）
+SALES_COLUMN_TYPES = {
+    "date": pa.timestamp("ns"),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "units": pa.int32(),
+    "unit_price": pa.int32(),
+    "region": pa.dictionary(pa.int32(), pa.string()),
+    "sales_channel": pa.dictionary(pa.int32(), pa.string()),
+    "customer_segment": pa.dictionary(pa.int32(), pa.string()),
+    "revenue": pa.int64(),
+}
+
+
+def parquet_sidecar_path(csv_path: str) -> str:
+    """Return the Parquet sidecar path for a CSV file"""
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def read_sales_csv(csv_path: str = CSV_PATH) -> pa.Table:
+    """Parse the sales CSV with an explicit schema"""
+    convert_options = pv.ConvertOptions(column_types=SALES_COLUMN_TYPES)
+    return pv.read_csv(csv_path, convert_options=convert_options)
+
+
+def _has_sales_types(schema: pa.Schema) -> bool:
+    """Check that a (possibly older) sidecar was written with the current column types"""
+    return all(
+        schema.field(name).type == dtype
+        for name, dtype in SALES_COLUMN_TYPES.items()
+        if name in schema.names
+    )
+
+
+def load_sales_table(csv_path: str = CSV_PATH) -> pa.Table:
+    """Load sales data as an Arrow table, using the Parquet sidecar when it is newer than the CSV"""
+    pq_path = parquet_sidecar_path(csv_path)
+    if os.path.exists(pq_path) and os.path.getmtime(pq_path) >= os.path.getmtime(csv_path):
+        try:
+            table = pq.read_table(pq_path)
+            if _has_sales_types(table.schema):
+                return table
+        except (OSError, pa.ArrowInvalid):
+            # 壊れた・読めないサイドカーはキャッシュミスとして CSV を読み直す
+            pass
+
+    table = read_sales_csv(csv_path)
+
+    # 書き込みごとに一意な一時ファイルへ書いてから置き換え
+    # （同時に起動した別プロセスと一時ファイルを共有せず、読み手が書きかけを読まないように）
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(pq_path) or ".", suffix=".parquet.tmp")
+        os.close(fd)
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, pq_path)
+    except OSError:
+        # 読み取り専用環境などではキャッシュせず CSV の結果をそのまま使う
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    return table
+
+
+def read_sales_frame(csv_path: str = CSV_PATH, arrow_dtypes: bool = False) -> pd.DataFrame:
+    """Load sales data as a DataFrame (NumPy/Categorical dtypes, or pyarrow-backed dtypes)"""
+    table = load_sales_table(csv_path)
+    types_mapper = pd.ArrowDtype if arrow_dtypes else None
+    return table.to_pandas(self_destruct=True, types_mapper=types_mapper)
@@ -6,7 +6,8 @@ st.write('Pandasを使ってCSVファイルを読み込み、表示してみま
 
 # CSVファイルを読み込む
 try:
-    df = pd.read_csv('data/sample_sales.csv')
+    # engine='pyarrow' を指定すると、マルチスレッドの pyarrow CSV パーサーで読み込まれます
+    df = pd.read_csv('data/sample_sales.csv', engine='pyarrow')
     st.success('CSVファイルの読み込みに成功しました！')
 
     # 読み込んだデータの最初の5行を表示する
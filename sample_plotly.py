@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
+import os
+
+from sales_data import read_sales_frame
 
 # ─────────────────────────────
 # アプリのタイトルと説明
@@ -11,33 +14,59 @@ st.write("Plotlyを使ってインタラクティブなグラフを作成して
 # ─────────────────────────────
 # データ読み込み
 # ─────────────────────────────
-# 'date' 列が文字列の場合に備え parse_dates で読み込む
-df = pd.read_csv("data/sample_sales.csv", parse_dates=["date"])
+# 初回に CSV を Parquet (data/sample_sales.parquet) へ変換し、以降は Parquet から読み込む。
+# 'date' 列は datetime 型のまま保存されるので parse_dates は不要。
+# st.cache_data により、ウィジェット操作による再実行ではメモリ上の結果を使う。
+# CSV の更新時刻もキャッシュキーに含め、CSV が書き換えられたら読み直す。
+@st.cache_data
+def load_sales(csv_path: str, csv_mtime: float) -> pd.DataFrame:
+    return read_sales_frame(csv_path)
+
+csv_path = "data/sample_sales.csv"
+df = load_sales(csv_path, os.path.getmtime(csv_path))
 
 st.subheader("日別売上推移")
 
 # ─────────────────────────────
 # 日別合計売上を計算
 # ─────────────────────────────
+# datetime64[D] への変換で時刻部分を NumPy 上で切り捨てて日付キーを作る
+# （.dt.date のように行ごとの Python date オブジェクトを作らない）
+day_key = df["date"].to_numpy().astype("datetime64[D]")
 daily_revenue = (
-    df.groupby(df["date"].dt.date)["revenue"]
+    df.groupby(day_key)["revenue"]
     .sum()
-    .reset_index()
-    .rename(columns={"date": "Date", "revenue": "Revenue"})
+    .rename_axis("Date")
+    .reset_index(name="Revenue")
 )
 
 # ─────────────────────────────
 # 折れ線グラフを作成（線色は赤）
 # ─────────────────────────────
-fig = px.line(
-    daily_revenue,
-    x="Date",
-    y="Revenue",
-    title="日別売上推移",
-    labels={"Date": "日付", "Revenue": "売上合計 (円)"},
-)
+# go.Scattergl で SVG ではなく WebGL で描画する。
+# 点数が数千を超えてもブラウザ側のパン・ズームが重くならない。
+# 列は NumPy 配列で直接渡し、Plotly Express の DataFrame 解析を通さない
+# （タイトル・軸ラベルは layout で指定）。
+# st.cache_data で daily_revenue ごとに図を dict にしてキャッシュし、
+# データが変わらない再実行では図の組み立てを省略する。
+@st.cache_data
+def make_fig(daily_revenue: pd.DataFrame) -> dict:
+    fig = go.Figure(
+        go.Scattergl(
+            x=daily_revenue["Date"].to_numpy(),
+            y=daily_revenue["Revenue"].to_numpy(),
+            mode="lines",
+            line=dict(color="red"),  # 線を赤色に
+        )
+    )
+    fig.update_layout(
+        title="日別売上推移",
+        xaxis_title="日付",
+        yaxis_title="売上合計 (円)",
+    )
+    return fig.to_dict()
 
-fig.update_traces(line_color="red")  # 線を赤色に変更
+fig = make_fig(daily_revenue)
 
 # ─────────────────────────────
 # グラフを表示
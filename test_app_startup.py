@@ -8,6 +8,29 @@ import sys
 import time
 import os
 import signal
+import tempfile
+import urllib.request
+from urllib.error import URLError
+
+HEALTH_URL = "http://localhost:8502/_stcore/health"
+
+def wait_for_health(process, timeout=30.0):
+    """Poll the Streamlit health endpoint until it answers, with 50ms -> 500ms backoff"""
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while time.monotonic() < deadline:
+        # Stop waiting as soon as the process has exited
+        if process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(HEALTH_URL, timeout=0.5) as response:
+                if response.status == 200:
+                    return True
+        except (URLError, OSError):
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+    return False
 
 def test_app_startup():
     """Test that the app starts successfully"""
@@ -17,37 +40,36 @@ def test_app_startup():
     env = os.environ.copy()
     env['OPENAI_API_KEY'] = 'test-key-for-startup-test'
     
+    # Send server output to a log file instead of a pipe, so a chatty server
+    # can never block on a full pipe buffer while we wait for it
+    logf = tempfile.NamedTemporaryFile('w+', suffix='.log', delete=False)
     try:
         # Start the Streamlit app in the background
         process = subprocess.Popen(
             ['uv', 'run', 'streamlit', 'run', 'chatbot_app.py', '--server.headless', 'true', '--server.port', '8502'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stdout=logf,
+            stderr=subprocess.STDOUT,
             env=env,
             text=True
         )
         
         # Wait for the app to start
         print("⏳ Waiting for app to start...")
-        time.sleep(8)
+        ready = wait_for_health(process)
         
         # Check if process is still running
-        if process.poll() is None:
+        if ready and process.poll() is None:
             print("✅ App started successfully!")
             
-            # Try to get some output
-            try:
-                stdout, stderr = process.communicate(timeout=2)
-                if "You can now view your Streamlit app" in stdout or "Local URL" in stdout:
-                    print("✅ Streamlit server is running")
-                else:
-                    print("ℹ️  App started but checking logs...")
-                    if stderr:
-                        print(f"   Stderr: {stderr[:200]}...")
-                    if stdout:
-                        print(f"   Stdout: {stdout[:200]}...")
-            except subprocess.TimeoutExpired:
-                print("✅ App is running (timeout on communicate is normal)")
+            # Check the log for the startup banner
+            logf.seek(0)
+            output = logf.read()
+            if "You can now view your Streamlit app" in output or "Local URL" in output:
+                print("✅ Streamlit server is running")
+            else:
+                print("ℹ️  App started but checking logs...")
+                if output:
+                    print(f"   Output: {output[:200]}...")
             
             # Clean up
             process.terminate()
@@ -58,13 +80,16 @@ def test_app_startup():
             
             return True
         else:
-            stdout, stderr = process.communicate()
+            # Health check timed out while the process is still up
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            logf.seek(0)
+            output = logf.read()
             print(f"❌ App failed to start")
             print(f"   Return code: {process.returncode}")
-            if stderr:
-                print(f"   Error: {stderr}")
-            if stdout:
-                print(f"   Output: {stdout}")
+            if output:
+                print(f"   Output: {output}")
             return False
             
     except Exception as e:
@@ -74,6 +99,9 @@ def test_app_startup():
         except:
             pass
         return False
+    finally:
+        logf.close()
+        os.remove(logf.name)
 
 if __name__ == "__main__":
     success = test_app_startup()
@@ -7,6 +7,7 @@ import pandas as pd
 import duckdb
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # Add current directory to path to import chatbot functions
 sys.path.append('.')
@@ -23,47 +24,9 @@ from chatbot_app import (
     summarize_result
 )
 
-def test_basic_functions():
-    """Test core chatbot functions"""
-    print("🧪 Testing chatbot functions...")
-    
-    # Test 1: Data loading
-    print("\n1. Testing data loading...")
-    try:
-        # Mock streamlit functions for testing
-        import streamlit as st
-        st.error = print
-        st.stop = lambda: None
-        
-        sales_df = load_sales_data()
-        print(f"✅ Data loaded successfully: {len(sales_df)} rows")
-        print(f"   Columns: {list(sales_df.columns)}")
-        print(f"   Date range: {sales_df['date'].min()} to {sales_df['date'].max()}")
-    except Exception as e:
-        print(f"❌ Data loading failed: {e}")
-        return False
-    
-    # Test 2: DuckDB initialization
-    print("\n2. Testing DuckDB initialization...")
-    try:
-        con = init_duckdb(sales_df)
-        
-        # Test the sales view
-        test_query = "SELECT COUNT(*) as total FROM sales"
-        result = con.execute(test_query).fetchone()
-        print(f"✅ DuckDB initialized: {result[0]} records in sales view")
-        
-        # Test month column
-        month_query = "SELECT DISTINCT month FROM sales ORDER BY month LIMIT 3"
-        months = con.execute(month_query).fetchall()
-        print(f"   Sample months: {[m[0] for m in months]}")
-        
-    except Exception as e:
-        print(f"❌ DuckDB initialization failed: {e}")
-        return False
-    
-    # Test 3: SQL safety checks
-    print("\n3. Testing SQL safety...")
+def check_sql_safety():
+    """Test 3: SQL safety checks"""
+    details = []
     safe_queries = [
         "SELECT * FROM sales",
         "SELECT category, SUM(revenue) FROM sales GROUP BY category",
@@ -79,18 +42,20 @@ def test_basic_functions():
     
     for query in safe_queries:
         if not is_safe_sql(query):
-            print(f"❌ Safe query marked as unsafe: {query}")
-            return False
-    print("✅ Safe queries passed")
+            details.append(f"❌ Safe query marked as unsafe: {query}")
+            return "SQL safety", False, details
+    details.append("✅ Safe queries passed")
     
     for query in unsafe_queries:
         if is_safe_sql(query):
-            print(f"❌ Unsafe query marked as safe: {query}")
-            return False
-    print("✅ Unsafe queries blocked")
-    
-    # Test 4: Fallback SQL
-    print("\n4. Testing fallback SQL...")
+            details.append(f"❌ Unsafe query marked as safe: {query}")
+            return "SQL safety", False, details
+    details.append("✅ Unsafe queries blocked")
+    return "SQL safety", True, details
+
+def check_fallback_sql():
+    """Test 4: Fallback SQL"""
+    details = []
     test_cases = [
         ("月毎のカテゴリ別の売り上げ", "month"),
         ("チャネルごとの売上", "sales_channel"),
@@ -101,12 +66,14 @@ def test_basic_functions():
     for msg, expected in test_cases:
         fallback = fallback_sql(msg)
         if expected in fallback.lower():
-            print(f"✅ Fallback for '{msg}': correct pattern")
+            details.append(f"✅ Fallback for '{msg}': correct pattern")
         else:
-            print(f"❌ Fallback for '{msg}': unexpected result")
-    
-    # Test 5: SQL execution
-    print("\n5. Testing SQL execution...")
+            details.append(f"❌ Fallback for '{msg}': unexpected result")
+    return "fallback SQL", True, details
+
+def check_sql_execution(con):
+    """Test 5: SQL execution"""
+    details = []
     try:
         # Test representative queries
         queries = [
@@ -115,23 +82,29 @@ def test_basic_functions():
             "SELECT region, SUM(revenue) AS total_revenue FROM sales GROUP BY region ORDER BY total_revenue DESC"
         ]
         
-        for i, query in enumerate(queries, 1):
-            result_df = run_sql(con, query)
-            print(f"✅ Query {i} executed: {len(result_df)} rows, columns: {list(result_df.columns)}")
+        # Run the queries concurrently, each on its own cursor
+        # (cursors share the database but execute independently)
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            futures = [executor.submit(run_sql, con.cursor(), query) for query in queries]
+            results = [future.result() for future in futures]
+        
+        for i, result_df in enumerate(results, 1):
+            details.append(f"✅ Query {i} executed: {len(result_df)} rows, columns: {list(result_df.columns)}")
             
             # Test summarization
             summary = summarize_result(result_df)
-            print(f"   Summary: {summary}")
+            details.append(f"   Summary: {summary}")
             
             if i == 1:  # Show sample data for first query
-                print(f"   Sample data:\n{result_df.head(3).to_string()}")
+                details.append(f"   Sample data:\n{result_df.head(3).to_string()}")
                 
     except Exception as e:
-        print(f"❌ SQL execution failed: {e}")
-        return False
-    
-    # Test 6: System prompt
-    print("\n6. Testing system prompt...")
+        details.append(f"❌ SQL execution failed: {e}")
+        return "SQL execution", False, details
+    return "SQL execution", True, details
+
+def check_system_prompt():
+    """Test 6: System prompt"""
     prompt = build_system_prompt()
     required_elements = [
         "既存の sales テーブル",
@@ -143,9 +116,66 @@ def test_basic_functions():
     
     for element in required_elements:
         if element not in prompt:
-            print(f"❌ System prompt missing: {element}")
+            return "system prompt", False, [f"❌ System prompt missing: {element}"]
+    return "system prompt", True, ["✅ System prompt contains required elements"]
+
+def test_basic_functions():
+    """Test core chatbot functions"""
+    print("🧪 Testing chatbot functions...")
+    
+    # Test 1: Data loading
+    print("\n1. Testing data loading...")
+    try:
+        # Mock streamlit functions for testing
+        import streamlit as st
+        st.error = print
+        st.stop = lambda: None
+        
+        sales_df = load_sales_data()
+        print(f"✅ Data loaded successfully: {len(sales_df)} rows")
+        print(f"   Columns: {list(sales_df.columns)}")
+        print(f"   Date range: {sales_df['date'].min()} to {sales_df['date'].max()}")
+    except Exception as e:
+        print(f"❌ Data loading failed: {e}")
+        return False
+    
+    # Test 2: DuckDB initialization
+    print("\n2. Testing DuckDB initialization...")
+    try:
+        con = init_duckdb(sales_df)
+        
+        # Test the sales table
+        test_query = "SELECT COUNT(*) as total FROM sales"
+        result = con.execute(test_query).fetchone()
+        print(f"✅ DuckDB initialized: {result[0]} records in sales table")
+        
+        # Test month column
+        month_query = "SELECT DISTINCT month FROM sales ORDER BY month LIMIT 3"
+        months = con.execute(month_query).fetchall()
+        print(f"   Sample months: {[m[0] for m in months]}")
+        
+    except Exception as e:
+        print(f"❌ DuckDB initialization failed: {e}")
+        return False
+    
+    # Tests 3-6 are independent of each other, so run them concurrently
+    # (DuckDB releases the GIL while executing queries).
+    # Output is collected per stage and printed in stage order afterwards.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(check_sql_safety),
+            executor.submit(check_fallback_sql),
+            executor.submit(check_sql_execution, con),
+            executor.submit(check_system_prompt)
+        ]
+        results = [future.result() for future in futures]
+    
+    for stage, (name, ok, details) in enumerate(results, 3):
+        print(f"\n{stage}. Testing {name}...")
+        for line in details:
+            print(line)
+        if not ok:
             return False
-    print("✅ System prompt contains required elements")
     
     print("\n🎉 All tests passed successfully!")
     return True
@@ -1,23 +1,69 @@
 import streamlit as st
 from openai import OpenAI
-import pandas as pd
 import os
+
+from sales_data import read_sales_frame
+
 # API キーの確認
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     st.error("OPENAI_API_KEYが設定されていません。環境変数を確認してください。")
     st.stop()
 
-client = OpenAI(api_key=api_key, timeout=60.0, base_url="https://api.openai.com/v1")
+@st.cache_resource
+def get_client():
+    # クライアント（HTTP コネクションプール）は再実行ごとに作り直さず使い回す
+    return OpenAI(api_key=api_key, timeout=60.0, base_url="https://api.openai.com/v1")
+
+client = get_client()
 
+data_path = os.path.join("data", "sample_sales.csv")
+
+# csv_mtime はキャッシュキー（CSV が更新されたときだけ再計算される）
 @st.cache_data
-def load_sales_data():
-    data_path = os.path.join("data", "sample_sales.csv")
+def load_sales_data(csv_mtime):
     if os.path.exists(data_path):
-        return pd.read_csv(data_path)
+        return read_sales_frame(data_path)
     return None
 
-sales_data = load_sales_data()
+@st.cache_data
+def get_sales_overview(csv_mtime):
+    # サイドバーとシステムプロンプトで使う集計値は一度だけ計算する
+    sales_data = load_sales_data(csv_mtime)
+    if sales_data is None:
+        return None
+    return {
+        "start_date": sales_data['date'].min().date(),
+        "end_date": sales_data['date'].max().date(),
+        "num_rows": len(sales_data),
+        "num_categories": sales_data['category'].nunique(),
+        "total_revenue": int(sales_data['revenue'].sum()),
+    }
+
+@st.cache_data
+def build_system_prompt(csv_mtime):
+    # システムプロンプトは CSV が変わらない限り同じなので、メッセージごとに組み立て直さない
+    content = """あなたは売上データ分析の専門家です。以下の売上データを使って質問に答えてください。
+
+利用可能なデータ:
+- date: 日付 (YYYY-MM-DD形式)
+- category: 商品カテゴリ (Electronics, Groceries, Clothing, Home & Kitchen, Sports, Beauty)
+- units: 販売数量
+- unit_price: 単価
+- region: 地域 (North, South, East, West)
+- sales_channel: 販売チャネル (Online, Store)  
+- customer_segment: 顧客セグメント (Consumer, Corporate, Small Business)
+- revenue: 売上高
+
+データ分析や集計が必要な質問には具体的な数値で回答し、グラフや表を作成できる場合は提案してください。"""
+
+    overview = get_sales_overview(csv_mtime)
+    if overview is not None:
+        content += f"\n\n現在のデータ概要:\n- 期間: {overview['start_date']} ～ {overview['end_date']}\n- レコード数: {overview['num_rows']:,} 件\n- 総売上: ¥{overview['total_revenue']:,}"
+    return content
+
+csv_mtime = os.path.getmtime(data_path) if os.path.exists(data_path) else None
+overview = get_sales_overview(csv_mtime)
 
 # アプリのタイトルを設定します
 st.title('シンプルなAIチャットボット')
@@ -25,11 +71,11 @@ st.title('シンプルなAIチャットボット')
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if sales_data is not None:
+if overview is not None:
     st.sidebar.markdown("### 📊 売上データ情報")
-    st.sidebar.markdown(f"**データ期間:** {sales_data['date'].min()} ～ {sales_data['date'].max()}")
-    st.sidebar.markdown(f"**総レコード数:** {len(sales_data):,} 件")
-    st.sidebar.markdown(f"**カテゴリ数:** {sales_data['category'].nunique()} 種類")
+    st.sidebar.markdown(f"**データ期間:** {overview['start_date']} ～ {overview['end_date']}")
+    st.sidebar.markdown(f"**総レコード数:** {overview['num_rows']:,} 件")
+    st.sidebar.markdown(f"**カテゴリ数:** {overview['num_categories']} 種類")
     st.sidebar.markdown("**利用可能なデータ:**")
     st.sidebar.markdown("- 日付、カテゴリ、数量、単価")
     st.sidebar.markdown("- 地域、販売チャネル、顧客セグメント")
@@ -50,25 +96,7 @@ if prompt := st.chat_input("何か質問してください..."):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        system_message = {
-            "role": "system", 
-            "content": """あなたは売上データ分析の専門家です。以下の売上データを使って質問に答えてください。
-
-利用可能なデータ:
-- date: 日付 (YYYY-MM-DD形式)
-- category: 商品カテゴリ (Electronics, Groceries, Clothing, Home & Kitchen, Sports, Beauty)
-- units: 販売数量
-- unit_price: 単価
-- region: 地域 (North, South, East, West)
-- sales_channel: 販売チャネル (Online, Store)  
-- customer_segment: 顧客セグメント (Consumer, Corporate, Small Business)
-- revenue: 売上高
-
-データ分析や集計が必要な質問には具体的な数値で回答し、グラフや表を作成できる場合は提案してください。"""
-        }
-        
-        if sales_data is not None:
-            system_message["content"] += f"\n\n現在のデータ概要:\n- 期間: {sales_data['date'].min()} ～ {sales_data['date'].max()}\n- レコード数: {len(sales_data):,} 件\n- 総売上: ¥{sales_data['revenue'].sum():,}"
+        system_message = {"role": "system", "content": build_system_prompt(csv_mtime)}
         
         messages = [system_message] + [
             {"role": m["role"], "content": m["content"]}
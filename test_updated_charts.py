@@ -6,12 +6,13 @@ Test the updated auto_chart function with labels-based approach
 import pandas as pd
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # Add current directory to path
 sys.path.append('.')
 
 # Import functions from chatbot_app
-from chatbot_app import load_sales_data, init_duckdb, run_sql
+from chatbot_app import load_sales_data, init_duckdb, run_sql, classify_chart, ChartKind
 
 def test_chart_patterns():
     """Test different chart patterns"""
@@ -50,10 +51,15 @@ def test_chart_patterns():
         }
     ]
     
-    for test_case in test_queries:
+    # Run the queries concurrently, each on its own cursor
+    # (cursors share the database but execute independently)
+    with ThreadPoolExecutor(max_workers=len(test_queries)) as executor:
+        futures = [executor.submit(run_sql, con.cursor(), test_case["query"]) for test_case in test_queries]
+    
+    for test_case, future in zip(test_queries, futures):
         print(f"\n🔍 Testing: {test_case['name']}")
         try:
-            result_df = run_sql(con, test_case["query"])
+            result_df = future.result()
             print(f"   ✅ Query executed: {len(result_df)} rows")
             print(f"   📊 Columns: {list(result_df.columns)}")
             print(f"   🎯 Expected: {test_case['expected_chart']}")
@@ -63,23 +69,15 @@ def test_chart_patterns():
                 print(f"   📋 Sample data:\n{result_df.head(3).to_string(index=False)}")
                 
                 # Test the chart logic (without actually creating plots)
-                cols = result_df.columns.tolist()
-                colset = set(cols)
+                kind = classify_chart(tuple(result_df.columns))
                 
                 # Check which pattern would be triggered
-                if {'month', 'category', 'total_revenue'}.issubset(colset):
+                if kind is ChartKind.LINE_BY_CATEGORY:
                     print("   🎨 Would create: Line chart with category colors")
-                elif len(cols) == 2:
-                    dim_col, value_col = cols[0], cols[1]
-                    dim_candidates = ['category', 'sales_channel', 'region', 'customer_segment']
-                    val_candidates = ['total_revenue', 'total_units', 'revenue', 'units', 'count']
-                    if dim_col in dim_candidates and value_col in val_candidates:
-                        print("   🎨 Would create: Bar chart")
-                elif 'month' in colset:
-                    val_candidates = ['total_revenue', 'total_units', 'revenue', 'units', 'count']
-                    value_col = next((v for v in val_candidates if v in colset and v != 'month'), None)
-                    if value_col:
-                        print("   🎨 Would create: Line chart")
+                elif kind is ChartKind.BAR:
+                    print("   🎨 Would create: Bar chart")
+                elif kind is ChartKind.LINE:
+                    print("   🎨 Would create: Line chart")
                 else:
                     print("   ❌ No chart pattern matched")
             